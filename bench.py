@@ -0,0 +1,999 @@
+"""Lokal benchmarklar: python bench.py <nom> [--n N]
+
+Vaqtinchalik DB bilan ishlaydi, haqiqiy DB_PATH ga tegmaydi.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import secrets
+import argparse
+import contextlib
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, quote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_")
+os.environ["DB_PATH"] = os.path.join(_tmpdir, "bench.db")
+os.environ.setdefault("TELEGRAM_TOKEN", "0:bench")
+
+import bot  # noqa: E402
+
+
+class FakeBotAPI:
+    """Minimal lokal Bot API (getMe/getUpdates/sendMessage/...). BOT_API_URL=fake.url bilan ishlating.
+
+    chaos (send*/edit*/answer* uchun): {"latency": maks. kechikish s, "flood": 429 ehtimoli,
+    "neterr": ulanishni javobsiz uzish, "timeout": javobni timeout_s ga kechiktirish,
+    "notfound": edit* da "message to edit not found"}. Kiritilgan xatolar self.faults da sanaladi."""
+
+    def __init__(self, per_token: bool = False, chaos: dict = None, seed: int = 0, record: bool = True):
+        self.lock = threading.Condition()
+        self.per_token = per_token  # True: har bot tokeni uchun alohida update navbati (multi-tenant)
+        self.updates = {}        # token -> [update, ...]
+        self.polling = set()     # getUpdates chaqirgan tokenlar
+        self.sent = Counter()    # token -> send*/edit* soni
+        self.calls = []          # (monotonic, method, params); record=False bo'lsa yozilmaydi (soak)
+        self.record = record
+        self.chaos = dict(chaos or {})
+        self.rng = random.Random(seed)
+        self.faults = Counter()  # flood/neterr/timeout/notfound -> soni
+        self.replies = Counter() # chat_id -> muvaffaqiyatli send*/edit* (soak userlari javobni kutadi)
+        self.next_update_id = 1
+        self.next_message_id = 1
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                token, method = self.path.rsplit("/", 2)[-2:]
+                token = token[3:] if token.startswith("bot") else token
+                params = {}
+                if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                    for k, v in parse_qsl(body.decode()):
+                        try:
+                            params[k] = json.loads(v)
+                        except ValueError:
+                            params[k] = v
+                status, payload = api.handle(method, params, token)
+                if status is None:
+                    self.close_connection = True  # chaos: javobsiz uzilish -> klientda NetworkError
+                    return
+                out = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(out)))
+                    self.end_headers()
+                    self.wfile.write(out)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # bot to'xtatildi
+
+            do_GET = do_POST
+
+            def log_message(self, *a):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/bot"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def push_update(self, upd: dict, token: str = ""):
+        with self.lock:
+            upd["update_id"] = self.next_update_id
+            self.next_update_id += 1
+            self.updates.setdefault(token if self.per_token else "", []).append(upd)
+            self.lock.notify_all()
+
+    def push_text(self, uid: int, text: str, token: str = ""):
+        msg = {"message_id": 0, "date": int(time.time()), "chat": {"id": uid, "type": "private"},
+               "from": {"id": uid, "is_bot": False, "first_name": f"u{uid}"}, "text": text}
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        self.push_update({"message": msg}, token)
+
+    def push_callback(self, uid: int, data: str, message_id: int = 0):
+        # Bir xabardagi bir xil tugma qisqa oynada double tap sifatida tashlanadi: har bosish o'z xabaridan
+        if not message_id:
+            with self.lock:
+                message_id = self.next_message_id
+                self.next_message_id += 1
+        self.push_update({"callback_query": {
+            "id": f"{uid}-{time.monotonic_ns()}", "chat_instance": str(uid), "data": data,
+            "from": {"id": uid, "is_bot": False, "first_name": f"u{uid}"},
+            "message": {"message_id": message_id, "date": int(time.time()),
+                        "chat": {"id": uid, "type": "private"}, "text": "..."},
+        }})
+
+    def _message(self, params: dict) -> dict:
+        with self.lock:
+            mid = self.next_message_id
+            self.next_message_id += 1
+        chat_id = params.get("chat_id", 0)
+        return {"message_id": params.get("message_id", mid), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": str(params.get("text", ""))}
+
+    def _inject(self, method: str):
+        c = self.chaos
+        if not c or not method.startswith(("send", "edit", "answer")):
+            return None
+        with self.lock:
+            r = self.rng.random()
+            delay = self.rng.random() * c.get("latency", 0.0)
+        if delay:
+            time.sleep(delay)
+        for kind in ("flood", "neterr", "timeout", "notfound"):
+            p = c.get(kind, 0.0)
+            if r < p and (kind != "notfound" or method.startswith("edit")):
+                with self.lock:
+                    self.faults[kind] += 1
+                if kind == "flood":
+                    return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                                 "parameters": {"retry_after": 1}}
+                if kind == "neterr":
+                    return None, None
+                if kind == "timeout":
+                    time.sleep(c.get("timeout_s", 6.0))  # so'rov bajariladi, lekin klient kutib ulgurmaydi
+                    return None
+                return 400, {"ok": False, "error_code": 400, "description": "Bad Request: message to edit not found"}
+            r -= p
+        return None
+
+    def handle(self, method: str, params: dict, token: str = ""):
+        if self.record:
+            self.calls.append((time.monotonic(), method, params))
+        fault = self._inject(method)
+        if fault is not None:
+            return fault
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}}
+        if method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            deadline = time.monotonic() + min(float(params.get("timeout") or 0), 1.0)
+            key = token if self.per_token else ""
+            with self.lock:
+                self.polling.add(token)
+                while True:
+                    q = self.updates[key] = [u for u in self.updates.get(key, ()) if u["update_id"] >= offset]
+                    if q or time.monotonic() >= deadline:
+                        break
+                    self.lock.wait(deadline - time.monotonic())
+                res = q[:100]
+            return 200, {"ok": True, "result": res}
+        if method.startswith(("send", "edit")):
+            with self.lock:
+                self.sent[token] += 1
+                self.replies[params.get("chat_id", 0)] += 1
+            return 200, {"ok": True, "result": self._message(params)}
+        return 200, {"ok": True, "result": True}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def timed(fn, *args, repeat=200):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+
+def seed_orders(n: int, items_per_order: int = 3, days: int = 365, products: int = 0):
+    conn = bot.db()
+    start = datetime.utcnow() - timedelta(days=days)
+    statuses = ["DELIVERED"] * 8 + ["REJECTED", "NEW"]
+    orders = []
+    items = []
+    for i in range(1, n + 1):
+        created = (start + timedelta(seconds=i * days * 86400 // n)).isoformat()
+        orders.append((i, random.randint(1, 50000), "", "", None, None, "", 30.0, random.choice(statuses), created))
+        pids = random.sample(range(1, products + 1), items_per_order) if products else range(1, items_per_order + 1)
+        for pid in pids:
+            items.append((i, pid, f"P{pid}", "KG", 10.0, 1.0, 10.0))
+        if len(orders) >= 50000:
+            _flush(conn, orders, items)
+    _flush(conn, orders, items)
+    conn.close()
+
+
+def _flush(conn, orders, items):
+    with conn:
+        conn.executemany("""
+            INSERT INTO orders(id, user_id, phone, address, location_lat, location_lon, note, total_sar, status, created_at)
+            VALUES(?,?,?,?,?,?,?,?,?,?)
+        """, orders)
+        conn.executemany("""
+            INSERT INTO order_items(order_id, product_id, name, unit, price_per_unit, qty, line_total)
+            VALUES(?,?,?,?,?,?,?)
+        """, items)
+    orders.clear()
+    items.clear()
+
+
+# Arxivdan oldingi (baseline) sxema: order_items(order_id) indeksi yo'q, arxiv jadvallari yo'q
+_BASELINE_ORDERS_DDL = """
+CREATE TABLE orders(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    phone TEXT DEFAULT '',
+    address TEXT DEFAULT '',
+    location_lat REAL,
+    location_lon REAL,
+    note TEXT DEFAULT '',
+    total_sar REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE order_items(
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    price_per_unit REAL NOT NULL,
+    qty REAL NOT NULL,
+    line_total REAL NOT NULL,
+    FOREIGN KEY(order_id) REFERENCES orders(id)
+);
+"""
+
+
+def bench_archive(n: int):
+    """before: baseline sxemadagi alohida DB (indekssiz, arxivsiz); after: joriy sxema + archive_old_orders."""
+    import sqlite3
+    recent = n - 5
+    old = 10
+
+    def connect():
+        conn = bot.db()
+        conn.execute("SELECT 1 FROM orders LIMIT 0").fetchall()   # sxemani o'qish: har ulanishda bir marta
+        conn.close()
+
+    def views():
+        return {
+            "db() ulanish (overhead)": timed(connect),
+            "list_orders(10)": timed(bot.list_orders, 10),
+            "get_order(recent)": timed(bot.get_order, recent),
+            "get_order_items(recent)": timed(bot.get_order_items, recent),
+            "get_order(archived)": timed(bot.get_order, old),
+            "get_order_items(archived)": timed(bot.get_order_items, old),
+        }
+
+    base_path = os.path.join(_tmpdir, "archive_baseline.db")
+    conn = sqlite3.connect(base_path)
+    conn.executescript(_BASELINE_ORDERS_DDL)
+    conn.close()
+    token = bot._tenant.set(bot.Tenant("baseline", "0:bench", set(), "baseline", base_path, catalog_path=""))
+    try:
+        seed_orders(n)
+        before = views()
+    finally:
+        bot._tenant.reset(token)
+
+    bot.init_db()
+    t0 = time.perf_counter()
+    seed_orders(n)
+    print(f"seed: {n} buyurtma, {time.perf_counter() - t0:.1f}s")
+    t0 = time.perf_counter()
+    moved = bot.archive_old_orders(days=bot.ARCHIVE_DAYS, batch=bot.ARCHIVE_BATCH)
+    print(f"archive: {moved} buyurtma, {time.perf_counter() - t0:.1f}s")
+    after = views()
+
+    print(f"{'view':28} {'before ms':>10} {'after ms':>10}")
+    for k in before:
+        print(f"{k:28} {before[k]:10.3f} {after[k]:10.3f}")
+
+
+def bench_backup(n: int):
+    import asyncio
+    from types import SimpleNamespace
+
+    bot.init_db()
+    seed_orders(n)
+
+    async def checkout_write(update, context):
+        await asyncio.to_thread(bot.set_order_status, n - (update % 100), "ACCEPTED")
+
+    async def traffic(stop):
+        # Backup paytida jonli yozuvlar (checkout); logged() orqali handler davomiyligi sifatida o'lchanadi
+        handler = bot.logged(checkout_write)
+        ctx = SimpleNamespace(application=SimpleNamespace(bot_data={"tenant": bot.tenant()}))
+        i = 0
+        while not stop.is_set():
+            await handler(i, ctx)
+            i += 1
+            await asyncio.sleep(0.01)
+        return i
+
+    async def run():
+        stop = asyncio.Event()
+        t = asyncio.create_task(traffic(stop))
+        res = await bot.run_backup()
+        stop.set()
+        writes = await t
+        return res, writes
+
+    res, writes = asyncio.run(run())
+    for k, v in res.items():
+        print(f"{k:14} {v}")
+    print(f"{'live writes':14} {writes}")
+
+
+def bench_export(n: int):
+    import tracemalloc
+
+    bot.init_db()
+    seed_orders(n)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    path, rows = bot.export_orders("2000-01-01", "2100-01-01", "csv")
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"csv: {rows} qator, {os.path.getsize(path) / 1e6:.1f} MB, {dt:.1f}s, peak python mem {peak / 1e6:.2f} MB")
+    os.remove(path)
+
+
+def bench_startup(n: int):
+    env = dict(os.environ, DB_PATH=os.path.join(_tmpdir, "startup.db"), TELEGRAM_TOKEN="1:startup")
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    out = subprocess.run(
+        [sys.executable, "-c", "import time; t = time.perf_counter(); import bot; print(time.perf_counter() - t)"],
+        cwd=here, env=env, capture_output=True, text=True, check=True,
+    )
+    print(f"import bot:          {float(out.stdout) * 1000:8.1f} ms")
+
+    t = bot.Tenant("startup", "1:startup", set(), "startup", env["DB_PATH"])
+    token = bot._tenant.set(t)
+    try:
+        for label in ("init_db (cold)", "init_db (warm)"):
+            t0 = time.perf_counter()
+            bot.init_db()
+            print(f"{label + ':':20} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+        # Katalog + tavsiyalar matritsasi: startupdagi snapshot/recs ishi ko'rinsin
+        nprod = 5000
+        conn = bot.db()
+        with conn:
+            conn.executemany(
+                "INSERT INTO products(id, name, description, photo_file_id, is_active, created_at) VALUES(?,?,?,?,1,?)",
+                [(i, f"Mahsulot {i}", "Tavsif", "", "x") for i in range(1, nprod + 1)])
+            conn.executemany(
+                "INSERT INTO product_variants(product_id, unit, price_per_unit, base_price, step, min_qty, max_qty)"
+                " VALUES(?,?,?,?,?,?,?)", [(i, u, 9.5, 9.5, 0.5, 0.5, 50) for i in range(1, nprod + 1) for u in ("KG", "PC")])
+            conn.executemany("INSERT INTO product_categories(product_id, category_id) VALUES(?,?)",
+                             [(i, 1 + i % 10) for i in range(1, nprod + 1)])
+        conn.close()
+        seed_orders(50000, items_per_order=4, products=nprod)
+        bot.rebuild_recs()
+        for label in ("cold", "warm"):
+            t0 = time.perf_counter()
+            bot.prepare_tenant()
+            print(f"{'prepare_tenant (' + label + '):':20} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+        t0 = time.perf_counter()
+        bot.load_recs()
+        print(f"{'load_recs (fonda):':20} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+        os.remove(t.catalog_path)   # birinchi run snapshotsiz (cold), keyingilari warm
+    finally:
+        bot._tenant.reset(token)
+
+    for run in range(max(1, min(n, 5))):
+        fake = FakeBotAPI().start()
+        port = free_port()
+        penv = dict(env, PORT=str(port), BOT_API_URL=fake.url)
+        t0 = time.monotonic()
+        proc = subprocess.Popen([sys.executable, "bot.py"], cwd=here, env=penv,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        t_health = t_update = None
+        fake.push_text(42, "/start")
+        try:
+            while time.monotonic() - t0 < 30 and (t_health is None or t_update is None):
+                if t_health is None:
+                    try:
+                        urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=0.2).read()
+                        t_health = time.monotonic() - t0
+                    except OSError:
+                        pass
+                if t_update is None:
+                    for ts, method, _ in list(fake.calls):
+                        if method == "sendMessage":
+                            t_update = ts - t0
+                            break
+                time.sleep(0.005)
+        finally:
+            proc.terminate()
+            proc.wait()
+            fake.stop()
+        fmt = lambda v: f"{v * 1000:8.1f} ms" if v is not None else "   (yo'q)"
+        print(f"run {run + 1} ({'cold' if run == 0 else 'warm'}): health {fmt(t_health)}, first update {fmt(t_update)}")
+
+
+# Alohida jarayonda: bitta rejimdagi lookuplar xotirasi boshqa rejimning keshlari/sahifalari bilan aralashmaydi
+_CATALOG_RSS_CHILD = """
+import sys, json, random
+import bot
+
+def rss():
+    out = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "RssAnon", "RssFile")):
+                k, v = line.split(":")
+                out[k] = int(v.split()[0])
+    return out
+
+mode, n = sys.argv[1], int(sys.argv[2])
+if mode == "sqlite":
+    bot.tenant().catalog_path = ""
+base = rss()
+for p in random.sample(range(1, n + 1), min(n, 20000)):
+    bot.get_product(p)
+    bot.get_variants(p)
+for c in range(1, 11):
+    bot.get_products_in_category(c, 30)
+print(json.dumps({"base": base, "after": rss()}))
+"""
+
+
+def bench_catalog(n: int):
+    bot.init_db()
+    conn = bot.db()
+    with conn:
+        conn.executemany(
+            "INSERT INTO products(id, name, description, photo_file_id, is_active, created_at) VALUES(?,?,?,?,1,?)",
+            [(i, f"Mahsulot {i}", "Tavsif " * 5, f"photo{i}", "x") for i in range(1, n + 1)])
+        conn.executemany(
+            "INSERT INTO product_variants(product_id, unit, price_per_unit, step, min_qty, max_qty) VALUES(?,?,?,?,?,?)",
+            [(i, u, 9.5, 0.5, 0.5, 50) for i in range(1, n + 1) for u in ("KG", "PC")])
+        conn.executemany(
+            "INSERT INTO product_categories(product_id, category_id) VALUES(?,?)",
+            [(i, 1 + i % 10) for i in range(1, n + 1)])
+    conn.close()
+
+    t0 = time.perf_counter()
+    bot.publish_catalog()
+    print(f"publish: {n} mahsulot, {(time.perf_counter() - t0) * 1000:.0f} ms, "
+          f"{os.path.getsize(bot.tenant().catalog_path) / 1e6:.1f} MB")
+
+    pids = [random.randint(1, n) for _ in range(2000)]
+    cases = [
+        ("get_product", lambda: [bot.get_product(p) for p in pids]),
+        ("get_variants", lambda: [bot.get_variants(p) for p in pids]),
+        ("get_variant", lambda: [bot.get_variant(p, "KG") for p in pids]),
+        ("products_in_category[:30]", lambda: [bot.get_products_in_category(1 + p % 10, 30) for p in pids[:50]]),
+    ]
+    results = {}
+    for mode in ("snapshot", "sqlite"):
+        t = bot.tenant()
+        path = t.catalog_path
+        if mode == "sqlite":
+            t.catalog_path = ""
+        for name, fn in cases:
+            t0 = time.perf_counter()
+            fn()
+            count = 50 if "category" in name else len(pids)
+            results.setdefault(name, {})[mode] = (time.perf_counter() - t0) / count * 1e6
+        t.catalog_path = path
+
+    print(f"{'lookup':28} {'snapshot us':>12} {'sqlite us':>12}")
+    for name, _ in cases:
+        r = results[name]
+        print(f"{name:28} {r['snapshot']:12.1f} {r['sqlite']:12.1f}")
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, DB_PATH=bot.tenant().db_path)
+    print(f"{'rss (kB, alohida jarayon)':28} {'import':>10} {'lookupdan keyin':>16} {'farq':>8}")
+    for mode in ("snapshot", "sqlite"):
+        out = subprocess.run([sys.executable, "-c", _CATALOG_RSS_CHILD, mode, str(n)],
+                             cwd=here, env=env, capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        for k in ("VmRSS", "RssAnon", "RssFile"):
+            print(f"{mode + ' ' + k:28} {r['base'][k]:10} {r['after'][k]:16} {r['after'][k] - r['base'][k]:+8}")
+    print("snapshot RssFile: mmap qilingan fayl sahifalari, workerlar o'rtasida page cache orqali umumiy")
+
+
+def bench_zones(n: int):
+    import math
+
+    lat0, lon0 = 24.70, 46.70
+    zones = []
+    for gy in range(5):
+        for gx in range(4):
+            cy, cx, r = lat0 + gy * 0.05, lon0 + gx * 0.06, 0.03
+            poly = [(cy + r * math.sin(a * math.pi / 3), cx + r * math.cos(a * math.pi / 3)) for a in range(6)]
+            zones.append(bot.Zone(f"Z{gy}{gx}", 5.0 + gx, poly, (cy - r, cx - r, cy + r, cx + r)))
+    idx = bot.ZoneIndex(zones)
+    pts = [(i, lat0 - 0.03 + random.random() * 0.26, lon0 - 0.03 + random.random() * 0.24) for i in range(n)]
+
+    t0 = time.perf_counter()
+    hits = sum(1 for _, la, lo in pts if idx.lookup(la, lo))
+    t_grid = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    brute = sum(1 for _, la, lo in pts if any(bot.point_in_polygon(la, lo, z.poly) for z in zones))
+    t_brute = time.perf_counter() - t0
+    print(f"lookup: {n} nuqta, zonada {hits} (brute {brute}); grid {t_grid / n * 1e6:.1f} us, brute {t_brute / n * 1e6:.1f} us")
+
+    t0 = time.perf_counter()
+    runs = bot.courier_runs(pts)
+    dt = time.perf_counter() - t0
+    sizes = [len(r[0]) for r in runs]
+    print(f"courier_runs: {n} buyurtma -> {len(runs)} reys (o'rt. {sum(sizes) / len(sizes):.1f}), {dt * 1000:.0f} ms")
+
+
+def bench_recs(n: int):
+    bot.init_db()
+    nprod = 2000
+    conn = bot.db()
+    with conn:
+        conn.executemany("INSERT INTO products(id, name, description, photo_file_id, is_active, created_at) VALUES(?,?,?,?,?,?)",
+                         [(i, f"Mahsulot {i}", "", "", 1, bot.now_iso()) for i in range(1, nprod + 1)])
+    conn.close()
+    bot.publish_catalog()
+    seed_orders(n, items_per_order=4, products=nprod)
+
+    t0 = time.perf_counter()
+    bot.rebuild_recs()
+    print(f"rebuild: {n} buyurtma, {len(bot.tenant().recs)} mahsulot, {time.perf_counter() - t0:.2f}s")
+    t0 = time.perf_counter()
+    bot.load_recs()
+    print(f"load_recs (startup): {(time.perf_counter() - t0) * 1000:.0f} ms")
+    print(f"recs_refresh (order_create): {timed(bot.recs_refresh, [1, 2, 3, 4]):.2f} ms")
+    print(f"kb_product_units: {timed(bot.kb_product_units, 7) * 1000:.0f} us")
+    print(f"related_products (savat, 10 ta): {timed(bot.related_products, list(range(1, 11))) * 1000:.0f} us")
+
+
+def bench_forecast(n: int):
+    """Bir yillik tarix (n buyurtma x 4 qator) ustida talab prognozi; yarmi arxivda."""
+    bot.init_db()
+    nprod = 2000
+    conn = bot.db()
+    with conn:
+        conn.executemany("INSERT INTO products(id, name, description, photo_file_id, is_active, created_at) VALUES(?,?,?,?,?,?)",
+                         [(i, f"Mahsulot {i}", "", "", 1, bot.now_iso()) for i in range(1, nprod + 1)])
+        conn.executemany("INSERT INTO product_variants(product_id, unit, price_per_unit, base_price, step, min_qty, max_qty)"
+                         " VALUES(?,?,?,?,?,?,?)", [(i, "KG", 10.0, 10.0, 0.5, 0.5, 50) for i in range(1, nprod + 1)])
+    conn.close()
+    t0 = time.perf_counter()
+    seed_orders(n, items_per_order=4, products=nprod)
+    print(f"seed: {n} buyurtma, {n * 4} qator, {time.perf_counter() - t0:.1f}s")
+    bot.archive_old_orders(days=180, batch=50000)
+
+    t0 = time.perf_counter()
+    rows = bot.demand_forecast()
+    dt = time.perf_counter() - t0
+    print(f"demand_forecast: {len(rows)} variant, {dt:.2f}s ({n * 4 / dt / 1e6:.1f}M qator/s)")
+    print(f"forecast_report: {timed(bot.forecast_report, rows) * 1000:.0f} us")
+
+
+def bench_order_view(n: int):
+    """Admin buyurtma ko'rinishi: sovuq yig'ish vs (oid, status) kesh, status o'zgarishida xabarlarni tahrirlash."""
+    import asyncio
+    bot.init_db()
+    n = min(n, 100000)
+    seed_orders(n, items_per_order=8)
+    oids = [random.randint(1, n) for _ in range(200)]
+
+    def cold():
+        for oid in oids:
+            bot.tenant().order_views.clear()
+            bot.order_view(oid)
+
+    def warm():
+        for oid in oids:
+            bot.order_view(oid)
+
+    print(f"yig'ish (kesh yo'q): {timed(cold, repeat=5) / len(oids) * 1000:.0f} us/buyurtma")
+    print(f"kesh (status o'qish bilan): {timed(warm, repeat=5) / len(oids) * 1000:.0f} us/buyurtma")
+    v = bot.order_view(oids[0])
+    print(f"order_view_set_status: {timed(bot.order_view_set_status, v, 'ACCEPTED') * 1000:.1f} us")
+
+    class SlowBot:
+        async def edit_message_text(self, *a, **kw):
+            await asyncio.sleep(0.05)   # ~Bot API javob vaqti
+
+    for i in range(10):
+        bot.order_msg_track(v.oid, 100 + i, i + 1)
+    t0 = time.perf_counter()
+    asyncio.run(bot.order_msgs_refresh(SlowBot(), v))
+    print(f"10 admin xabarini tahrirlash (50 ms/so'rov): {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+def _proc_rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS"):
+                return int(line.split()[1])
+    return 0
+
+
+def bench_tenants(n: int):
+    """bot.py ni TENANTS_PATH bilan (1 va 20 tenant) ishga tushiradi: RSS va /start throughput."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    n = min(n, 20000)
+    results = {}
+    for count in (1, 20):
+        fake = FakeBotAPI(per_token=True).start()
+        tokens = [f"{1000 + i}:tenant{i}" for i in range(count)]
+        path = os.path.join(_tmpdir, f"tenants{count}.json")
+        with open(path, "w") as f:
+            json.dump([{"name": f"t{i}", "token": tok, "admin_ids": [1], "shop_name": f"Filial {i}",
+                        "db_path": os.path.join(_tmpdir, f"tenant{count}_{i}.db")} for i, tok in enumerate(tokens)], f)
+        port = free_port()
+        env = dict(os.environ, TENANTS_PATH=path, BOT_API_URL=fake.url, PORT=str(port), LOG_LEVEL="WARNING")
+        env.pop("TELEGRAM_TOKEN", None)
+        proc = subprocess.Popen([sys.executable, "bot.py"], cwd=here, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            t0 = time.monotonic()
+            while len(fake.polling) < count and time.monotonic() - t0 < 60:
+                time.sleep(0.05)
+            t_ready = time.monotonic() - t0
+            time.sleep(1.0)
+            rss_idle = _proc_rss_kb(proc.pid)
+
+            total = n // count * count
+            t0 = time.monotonic()
+            for i in range(total):
+                fake.push_text(10_000 + i, "/start", tokens[i % count])
+            while sum(fake.sent.values()) < total and time.monotonic() - t0 < 300:
+                time.sleep(0.01)
+            dt = time.monotonic() - t0
+            rss_busy = _proc_rss_kb(proc.pid)
+            metrics = json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5))
+        finally:
+            proc.terminate()
+            proc.wait()
+            fake.stop()
+        done = sum(fake.sent.values())
+        results[count] = rss_idle
+        per = [m["updates"] for m in metrics.values()]
+        print(f"{count:2d} tenant: tayyor {t_ready:.1f}s, RSS {rss_idle / 1024:.1f} MB (yuklamadan keyin {rss_busy / 1024:.1f} MB), "
+              f"{done}/{total} /start, {done / dt:.0f} update/s, har tenant {min(per)}..{max(per)} update")
+    per_tenant = (results[20] - results[1]) / 19
+    print(f"qo'shimcha tenant: ~{per_tenant / 1024:.2f} MB; 20 alohida jarayon ~{results[1] * 20 / 1024:.0f} MB, "
+          f"bitta runner {results[20] / 1024:.0f} MB")
+
+
+def _chaos_from_env() -> dict:
+    raw = os.getenv("BENCH_CHAOS", "latency=0.02,flood=0.003,neterr=0.005,notfound=0.02,timeout=0")
+    return {k.strip(): float(v) for k, v in (p.split("=") for p in raw.split(",") if p.strip())}
+
+
+def bench_soak(n: int):
+    """Chaos/soak: bot.py alohida jarayonda, fake Bot API xato va kechikish kiritadi, simulyatsiya qilingan
+    userlar to'liq sessiya (katalog -> savat -> checkout) o'tadi, admin statuslarni o'zgartiradi.
+    Oynalar bo'yicha throughput, RSS va keshlar; oxirida yo'qolgan buyurtmalar.
+    Sozlash: BENCH_CHAOS="latency=..,flood=..,neterr=..,notfound=..,timeout=..", BENCH_SOAK_USERS (parallel userlar),
+    BENCH_SOAK_SECS (berilsa n o'rniga vaqt bo'yicha, masalan soatlab), BENCH_SOAK_THINK, BENCH_SOAK_REPORT."""
+    import asyncio
+    here = os.path.dirname(os.path.abspath(__file__))
+    users = int(os.getenv("BENCH_SOAK_USERS", "50"))
+    secs = float(os.getenv("BENCH_SOAK_SECS", "0"))
+    think = float(os.getenv("BENCH_SOAK_THINK", "0.05"))
+    every = float(os.getenv("BENCH_SOAK_REPORT", "10"))
+    sessions_max = min(n, 500) if not secs else 1 << 62
+    chaos = _chaos_from_env()
+
+    bot.init_db()
+    cid = bot.create_category("Meva")
+    pids = []
+    for i in range(20):
+        pid = bot.create_product(f"Mahsulot {i}", "", "")
+        bot.set_variant(pid, "KG", 5.0 + i, 0.5, 0.5, 20)
+        bot.attach_product_to_category(pid, cid)
+        pids.append(pid)
+
+    fake = FakeBotAPI(chaos=chaos, seed=1, record=False).start()
+    port = free_port()
+    env = dict(os.environ, BOT_API_URL=fake.url, PORT=str(port), LOG_LEVEL="WARNING", ADMIN_IDS="1")
+    log_path = os.path.join(_tmpdir, "soak.log")
+    log_file = open(log_path, "w")
+    proc = subprocess.Popen([sys.executable, "bot.py"], cwd=here, env=env,
+                            stdout=subprocess.DEVNULL, stderr=log_file)
+
+    def metrics() -> dict:
+        return json.load(urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5))["default"]
+
+    pushed = [0]
+    started = [0]
+    done = [0]
+    stalls = [0]
+    lat = []   # oynadagi qadam kechikishlari (update -> bot javobi), s
+
+    def push(uid: int, kind: str, data: str):
+        if kind == "text":
+            fake.push_text(uid, data)
+        else:
+            fake.push_callback(uid, data)
+        pushed[0] += 1
+
+    async def session(uid: int):
+        pid = random.choice(pids)
+        v = bot.get_variant(pid, "KG")
+        add = bot.cb_pack(bot.cb_from_variant(bot.CB_ADD, v, 1.5))
+        steps = [("text", "/start"), ("cb", "CAT"), ("cb", f"CAT:{cid}"), ("cb", f"P:{pid}"), ("cb", f"U:{pid}:KG"),
+                 ("cb", add), ("cb", "CART"), ("cb", "CHECKOUT"), ("text", "+966500000000"),
+                 ("text", "o‘tib ket"), ("text", f"Manzil {uid}"), ("text", "yo‘q")]
+        for kind, data in steps:
+            before = fake.replies[uid]
+            t = time.monotonic()
+            push(uid, kind, data)
+            # Haqiqiy user kabi bot javobini kutadi; javob kelmasa (yo'qolgan xabar) 30s dan keyin davom etadi
+            while fake.replies[uid] == before:
+                if time.monotonic() - t > 30:
+                    stalls[0] += 1
+                    break
+                await asyncio.sleep(0.005)
+            lat.append(time.monotonic() - t)
+            await asyncio.sleep(random.random() * think)
+
+    async def user(uid: int, stop: asyncio.Event):
+        while not stop.is_set() and started[0] < sessions_max:
+            started[0] += 1
+            await session(uid)
+            done[0] += 1
+
+    async def admin(stop: asyncio.Event):
+        i = 0
+        while not stop.is_set():
+            await asyncio.sleep(1.0)
+            if done[0]:
+                push(1, "cb", f"O:{('ACCEPT', 'DONE')[i % 2]}:{random.randint(1, done[0])}")
+                i += 1
+
+    async def run():
+        t_start = time.monotonic()
+        while not fake.polling and time.monotonic() - t_start < 60:
+            await asyncio.sleep(0.05)
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(user(10_000 + i, stop)) for i in range(users)]
+        adm = asyncio.create_task(admin(stop))
+        t0 = last_t = time.monotonic()
+        last_upd = 0
+        windows = []
+        print(f"chaos: {chaos}, {users} parallel user")
+        print("   vaqt  sessiya  update/s  p50/p95 ms    RSS MB  user_data  order_views  seen_upd  retry/fail/err  faults")
+        while True:
+            await asyncio.sleep(every)
+            now = time.monotonic()
+            m = await asyncio.to_thread(metrics)
+            rate = (m["updates"] - last_upd) / (now - last_t)
+            last_upd, last_t = m["updates"], now
+            rss = _proc_rss_kb(proc.pid) / 1024
+            windows.append((rate, rss))
+            ls = sorted(lat) or [0.0]
+            lat.clear()
+            p50, p95 = ls[len(ls) // 2] * 1000, ls[int(len(ls) * 0.95)] * 1000
+            print(f"{now - t0:6.0f}s {done[0]:8d} {rate:9.1f} {p50:5.0f}/{p95:<5.0f} {rss:9.1f} {m['user_data']:10d} {m['order_views']:12d} "
+                  f"{m['seen_updates']:9d}  {m['tg_retries']}/{m['tg_failed']}/{m['errors']}  {dict(fake.faults)}")
+            if (secs and now - t0 >= secs) or (not secs and done[0] >= sessions_max):
+                break
+        stop.set()
+        await asyncio.gather(*tasks, adm)
+        # Navbat tugashini kutish (yangi update qayta ishlanmay qolsa ham 60s dan keyin to'xtaymiz)
+        t_drain = time.monotonic()
+        while time.monotonic() - t_drain < 60:
+            m = await asyncio.to_thread(metrics)
+            if m["updates"] + m["dup_updates"] >= pushed[0]:
+                break
+            await asyncio.sleep(0.5)
+        return windows, m
+
+    try:
+        windows, m = asyncio.run(run())
+    finally:
+        proc.terminate()
+        proc.wait()
+        fake.stop()
+        log_file.close()
+    conn = bot.db()
+    orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    conn.close()
+    steady = windows[:-1] if len(windows) > 2 else windows   # oxirgi oyna navbat qoldig'i (to'liq emas)
+    first, last = steady[0], steady[-1]
+    print(f"throughput: {first[0]:.1f} -> {last[0]:.1f} update/s ({(last[0] / first[0] - 1) * 100 if first[0] else 0:+.0f}%), "
+          f"RSS: {first[1]:.1f} -> {last[1]:.1f} MB")
+    print(f"update: {pushed[0]} yuborildi, {m['updates']} qayta ishlandi; xatolar {m['errors']}, "
+          f"edit fallback {m['edit_fallbacks']}, retry {m['tg_retries']}, muvaffaqiyatsiz {m['tg_failed']}")
+    print(f"sessiya {done[0]}, buyurtma {orders}, yo'qolgan {max(0, done[0] - orders)}, ortiqcha {max(0, orders - done[0])}, "
+          f"javobsiz qolgan qadamlar {stalls[0]}")
+
+
+@contextlib.contextmanager
+def _pg_scratch(url: str):
+    """BENCH_PG_URL ichida vaqtinchalik sxema; yield qilingan URL search_path ni unga qo'yadi.
+    Bench faqat shu sxemaga yozadi va oxirida uni o'chiradi: public va boshqa sxemalarga tegilmaydi."""
+    import psycopg
+    schema = f"bench_{os.getpid()}_{secrets.token_hex(4)}"
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    try:
+        yield url + ("&" if "?" in url else "?") + "options=" + quote(f"-c search_path={schema}")
+    finally:
+        with psycopg.connect(url, autocommit=True) as conn:
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+def _checkout_worker(args):
+    db_path, url, uids = args
+    bot._tenant.set(bot.Tenant("bench", "0:bench", set(), "bench", db_path, catalog_path="", database_url=url))
+    ok = errors = 0
+    for uid in uids:
+        try:
+            bot.user_touch(uid)
+            bot.cart_set(uid, 1 + uid % 50, "KG", 1.5)
+            bot.cart_set(uid, 1 + (uid * 7) % 50, "KG", 2.0)
+            if bot.order_create(uid, "+966", "addr", None, None, "", idem_key=f"bench:{uid}") > 0:
+                ok += 1
+        except Exception:
+            errors += 1
+    return ok, errors
+
+
+def _storage_run(name: str, url: str, procs: int, n: int, ctx):
+    """Bitta backend/jarayonlar soni uchun: sxema + 50 mahsulot, so'ng checkout workerlar."""
+    db_path = os.path.join(_tmpdir, f"storage_{procs}.db")
+    t = bot.Tenant("bench", "0:bench", set(), "bench", db_path, catalog_path="", database_url=url)
+    token = bot._tenant.set(t)
+    try:
+        bot.init_db()
+        conn = bot.db()
+        with conn:
+            conn.executemany(
+                "INSERT INTO products(id, name, description, photo_file_id, is_active, created_at) VALUES(?,?,?,?,1,?)",
+                [(i, f"Mahsulot {i}", "", "", "x") for i in range(1, 51)])
+            conn.executemany(
+                "INSERT INTO product_variants(product_id, unit, price_per_unit, base_price, step, min_qty, max_qty)"
+                " VALUES(?,?,?,?,?,?,?)", [(i, "KG", 9.5, 9.5, 0.5, 0.5, 50) for i in range(1, 51)])
+        conn.close()
+        if url:
+            t.storage.pool.close()
+    finally:
+        bot._tenant.reset(token)
+    per = n // procs
+    jobs = [(db_path, url, range(1 + k * per, 1 + (k + 1) * per)) for k in range(procs)]
+    t0 = time.perf_counter()
+    with ctx.Pool(procs) as pool:
+        res = pool.map(_checkout_worker, jobs)
+    dt = time.perf_counter() - t0
+    ok = sum(r[0] for r in res)
+    errors = sum(r[1] for r in res)
+    print(f"{name:8} {procs} jarayon: {ok} buyurtma, {ok / dt:7.0f} checkout/s, xato {errors}")
+
+
+def bench_storage(n: int):
+    """Checkout yozish throughput (user_touch + 2x cart_set + order_create) bir nechta jarayonda.
+    PostgreSQL ham o'lchanadi, agar BENCH_PG_URL berilgan bo'lsa (psycopg[binary,pool] kerak);
+    har o'lchov o'sha bazadagi vaqtinchalik bench_* sxemada ishlaydi."""
+    import multiprocessing as mp
+    n = min(n, 20000)
+    backends = [("sqlite", "")]
+    if os.getenv("BENCH_PG_URL"):
+        backends.append(("postgres", os.environ["BENCH_PG_URL"]))
+    ctx = mp.get_context("fork")
+    for name, base_url in backends:
+        for procs in (1, 4, 8):
+            with _pg_scratch(base_url) if base_url else contextlib.nullcontext("") as url:
+                _storage_run(name, url, procs, n, ctx)
+
+
+def _parity_run(n: int) -> dict:
+    """Joriy tenant backendida: init_db -> checkout -> status -> arxiv -> eksport. Natijalar backendga bog'liq emas."""
+    bot.init_db()
+    bot.init_db()   # versiya bir xil: DDL qayta bajarilmaydi
+    a = bot.create_product("Olma", "", "")
+    b = bot.create_product("Non", "", "")
+    bot.set_variant(a, "KG", 10, 0.5, 0.5, 50)
+    bot.set_variant(b, "PC", 3, 1, 1, 10)
+    oids = []
+    for uid in range(1, n + 1):
+        bot.user_touch(uid)
+        bot.cart_set(uid, a, "KG", 1.5)
+        bot.cart_set(uid, b, "PC", 1 + uid % 3)
+        oids.append(bot.order_create(uid, "+966", "addr", None, None, "", "Z", 5.0, idem_key=f"parity:{uid}"))
+    bot.cart_set(1, a, "KG", 1)
+    assert bot.order_create(1, "+966", "addr", None, None, "", idem_key="parity:1") == -2
+    assert bot.order_create(n + 1, "+966", "addr", None, None, "") == -1
+    assert all(o > 0 for o in oids) and len(set(oids)) == n
+
+    old = (datetime.utcnow() - timedelta(days=bot.ARCHIVE_DAYS + 5)).isoformat()
+    half = oids[: n // 2]
+    for oid in half:
+        assert bot.set_order_status(oid, "DELIVERED")
+    conn = bot.db()
+    with conn:
+        conn.executemany("UPDATE orders SET created_at=? WHERE id=?", [(old, oid) for oid in half])
+    conn.close()
+    moved = bot.archive_old_orders(batch=7)
+    assert moved == len(half), moved
+    assert not bot.set_order_status(half[0], "CANCELLED")       # arxivdagi buyurtma o'zgarmaydi
+    assert bot.get_order_status(half[0]) == "DELIVERED"
+    assert len(bot.get_order_items(half[0])) == 2
+
+    d_from = (datetime.utcnow() - timedelta(days=bot.ARCHIVE_DAYS + 10)).date().isoformat()
+    d_to = (datetime.utcnow() + timedelta(days=1)).date().isoformat()
+    rows = list(bot.iter_order_rows(d_from, d_to, chunk=7))
+    path, written = bot.export_orders(d_from, d_to)
+    os.remove(path)
+    assert written == len(rows) == 2 * n, (written, len(rows))
+    return {
+        "moved": moved,
+        "rows": written,
+        "total": round(sum(float(r[17]) for r in rows), 2),
+        "lines": sorted((r[3], r[13], r[14], float(r[16])) for r in rows),
+    }
+
+
+def bench_parity(n: int):
+    """Smoke/parity: SQLite va (BENCH_PG_URL bo'lsa) PostgreSQL da bir xil ssenariy, natijalar teng bo'lishi shart."""
+    n = min(n, 200)
+    backends = [("sqlite", "")]
+    if os.getenv("BENCH_PG_URL"):
+        backends.append(("postgres", os.environ["BENCH_PG_URL"]))
+    results = {}
+    for name, base_url in backends:
+        with _pg_scratch(base_url) if base_url else contextlib.nullcontext("") as url:
+            t = bot.Tenant("parity", "0:bench", set(), "parity", os.path.join(_tmpdir, "parity.db"),
+                           catalog_path="", database_url=url)
+            token = bot._tenant.set(t)
+            try:
+                t0 = time.perf_counter()
+                results[name] = _parity_run(n)
+                print(f"{name:8} ok: {n} buyurtma, arxiv {results[name]['moved']}, eksport {results[name]['rows']} qator, "
+                      f"{time.perf_counter() - t0:.2f}s")
+            finally:
+                if url:
+                    t.storage.pool.close()
+                bot._tenant.reset(token)
+    first = next(iter(results.values()))
+    for name, r in results.items():
+        assert r == first, f"{name} natijasi farq qiladi"
+    print("parity: ok" if len(results) > 1 else "parity: faqat sqlite (BENCH_PG_URL berilmagan)")
+
+
+BENCHES = {
+    "archive": bench_archive,
+    "backup": bench_backup,
+    "catalog": bench_catalog,
+    "export": bench_export,
+    "recs": bench_recs,
+    "startup": bench_startup,
+    "storage": bench_storage,
+    "order_view": bench_order_view,
+    "parity": bench_parity,
+    "forecast": bench_forecast,
+    "soak": bench_soak,
+    "tenants": bench_tenants,
+    "zones": bench_zones,
+}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("name", choices=sorted(BENCHES))
+    ap.add_argument("--n", type=int, default=1_000_000)
+    args = ap.parse_args(argv)
+    BENCHES[args.name](args.n)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import contextlib
+import os
+import sys
+
+import pytest
+
+# bot.py import paytida TELEGRAM_TOKEN ni talab qiladi
+os.environ.setdefault("TELEGRAM_TOKEN", "0:test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+
+
+def _backends():
+    yield "sqlite"
+    # TEST_DATABASE_URL berilsa xuddi shu testlar Postgres ustida ham (vaqtinchalik sxemada) ishlaydi
+    yield pytest.param("postgres", marks=pytest.mark.skipif(
+        not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL yo'q"))
+
+
+@pytest.fixture(params=list(_backends()))
+def shop(request, tmp_path):
+    """Bo'sh DB li alohida Tenant; test davomida tenant() shu."""
+    with contextlib.ExitStack() as stack:
+        url = ""
+        if request.param == "postgres":
+            pytest.importorskip("psycopg_pool")
+            import bench
+            url = stack.enter_context(bench._pg_scratch(os.environ["TEST_DATABASE_URL"]))
+        t = bot.Tenant("test", "0:test", {1}, "Test", str(tmp_path / "shop.db"),
+                       catalog_path="", database_url=url)
+        token = bot._tenant.set(t)
+        bot.init_db()
+        yield t
+        bot._tenant.reset(token)
+        if url:
+            t.storage.pool.close()
@@ -0,0 +1,119 @@
+"""Storage shartnomasi: DB HELPERS dagi SQL SQLite va Postgres uchun bir xil ishlashi kerak."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import bot
+
+
+def _catalog():
+    cid = bot.create_category("Meva")
+    a = bot.create_product("Olma", "qizil", "")
+    b = bot.create_product("Non", "", "")
+    bot.set_variant(a, "KG", 10, 0.5, 0.5, 5)
+    bot.set_variant(b, "PC", 3, 1, 1, 10)
+    bot.attach_product_to_category(a, cid)
+    return cid, a, b
+
+
+def _ago(**kw) -> str:
+    return (datetime.utcnow() - timedelta(**kw)).isoformat()
+
+
+def test_init_db_is_idempotent(shop):
+    st = bot.storage()
+    conn = bot.db()
+    assert st.schema_version(conn.cursor()) == bot.SCHEMA_VERSION
+    conn.close()
+    bot.init_db()
+    assert bot.create_category("X") == bot.create_category("X")
+
+
+def test_rows_by_name_and_index(shop):
+    _, a, _ = _catalog()
+    conn = bot.db()
+    r = conn.execute("SELECT id, name FROM products WHERE id=?", (a,)).fetchone()
+    conn.close()
+    assert r[0] == r["id"] == a
+    assert list(r.keys()) == ["id", "name"]
+    assert dict(r) == {"id": a, "name": "Olma"}
+
+
+def test_lastrowid_and_rowcount(shop):
+    cid, a, b = _catalog()
+    assert 0 < a < b
+    rid = bot.price_rule_add("CATEGORY", cid, None, "PCT", 10, _ago(hours=1), _ago(hours=-1), 1)
+    assert rid > 0
+    assert bot.price_rule_delete(rid) is True
+    assert bot.price_rule_delete(rid) is False
+
+
+def test_transaction_rolls_back_on_error(shop):
+    conn = bot.db()
+    with pytest.raises(RuntimeError):
+        with conn:
+            conn.execute("INSERT INTO categories(name, is_active, created_at) VALUES(?,?,?)", ("Yo'q", 1, _ago()))
+            raise RuntimeError
+    assert conn.execute("SELECT id FROM categories WHERE name=?", ("Yo'q",)).fetchone() is None
+    conn.close()
+
+
+def test_price_rules_follow_set_variant(shop):
+    cid, a, _ = _catalog()
+    bot.price_rule_add("CATEGORY", cid, None, "PCT", 10, _ago(hours=1), _ago(hours=-1), 1)
+    assert bot.compile_prices(publish=False)[0] == 1
+    assert bot.get_variant(a, "KG")["price_per_unit"] == 9.0
+    bot.set_variant(a, "KG", 20, 0.5, 0.5, 5)
+    v = bot.get_variant(a, "KG", fresh=True)
+    assert (v["base_price"], v["price_per_unit"]) == (20.0, 18.0)
+    assert bot.tenant().variant_ver[(a, "KG")] == v["version"]
+
+
+def test_checkout_is_idempotent(shop):
+    _, a, b = _catalog()
+    bot.user_touch(7, "Ali")
+    bot.cart_set(7, a, "KG", 2)
+    bot.cart_set(7, b, "PC", 1)
+    assert [(r["name"], r["qty"]) for r in bot.cart_items(7)] == [("Non", 1.0), ("Olma", 2.0)]
+
+    oid = bot.order_create(7, "+998", "manzil", 41.3, 69.2, "", "Z", 5.0, "k1")
+    assert oid > 0
+    assert bot.cart_items(7) == []
+    bot.cart_set(7, a, "KG", 1)
+    assert bot.order_create(7, "+998", "manzil", None, None, "", idem_key="k1") == -2
+    assert bot.order_create(8, "+998", "manzil", None, None, "") == -1
+
+    assert bot.get_order(oid)["total_sar"] == 2 * 10 + 3 + 5.0
+    assert sorted(r["name"] for r in bot.get_order_items(oid)) == ["Non", "Olma"]
+    assert sorted((r["name"], r["times"]) for r in bot.get_favorites(7)) == [("Non", 1), ("Olma", 1)]
+    bot.rebuild_recs()
+    assert bot.tenant().recs == {a: [(b, 1)], b: [(a, 1)]}
+
+
+def test_archive_keeps_orders_readable(shop):
+    _, a, _ = _catalog()
+    bot.cart_set(7, a, "KG", 2)
+    oid = bot.order_create(7, "+998", "manzil", None, None, "")
+    assert bot.set_order_status(oid, "DELIVERED")
+    conn = bot.db()
+    conn.execute("UPDATE orders SET created_at=? WHERE id=?", (_ago(days=bot.ARCHIVE_DAYS + 1), oid))
+    conn.commit()
+    conn.close()
+
+    assert bot.archive_old_orders() == 1
+    assert bot.get_order(oid)["status"] == "DELIVERED"
+    assert [r["qty"] for r in bot.get_order_items(oid)] == [2.0]
+    assert bot.archive_old_orders() == 0
+
+
+def test_export_orders_csv(shop):
+    _, a, _ = _catalog()
+    for uid in (7, 8):
+        bot.cart_set(uid, a, "KG", 1)
+        bot.order_create(uid, "+998", "manzil", None, None, "")
+    today = datetime.utcnow().date()
+    rng = bot.parse_export_range(f"{today - timedelta(days=1)} {today + timedelta(days=1)}")
+    path, n = bot.export_orders(*rng)
+    assert n == 2
+    with open(path, encoding="utf-8-sig") as f:
+        assert f.read().count("\n") >= 3